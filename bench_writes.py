@@ -0,0 +1,91 @@
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from db_writer import DBWriter
+
+SQL = "INSERT INTO job_cards (train_id, job_card_no, status, source_system) VALUES (?, ?, ?, ?)"
+
+
+def _setup(db_name, wal):
+    conn = sqlite3.connect(db_name)
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE job_cards (id INTEGER PRIMARY KEY AUTOINCREMENT, train_id INTEGER, "
+                 "job_card_no TEXT, status TEXT, source_system TEXT)")
+    conn.commit()
+    conn.close()
+
+
+def _direct_write(db_name, args):
+    """The old insert_record path: own connection, one commit per row, rollback journal."""
+    conn = sqlite3.connect(db_name)
+    conn.execute(SQL, args)
+    conn.commit()
+    conn.close()
+
+
+def run(mode, writers, writes_per_writer, db_name):
+    writer = DBWriter(db_name) if mode == "writer" else None
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(w):
+        local, local_errors = [], 0
+        for i in range(writes_per_writer):
+            args = (w, f"JC-{w}-{i}", "Open", "bench")
+            start = time.perf_counter()
+            try:
+                if writer:
+                    writer.submit(SQL, args).result()
+                else:
+                    _direct_write(db_name, args)
+            except sqlite3.OperationalError:
+                local_errors += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors.append(local_errors)
+
+    # A concurrent reader, as a Streamlit session would be
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            conn = sqlite3.connect(db_name)
+            conn.execute("SELECT COUNT(*) FROM job_cards").fetchone()
+            conn.close()
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader_thread.join()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{mode:>6}: {total / elapsed:8.0f} writes/s  "
+          f"p50 {latencies[total // 2] * 1000:7.2f} ms  "
+          f"p99 {latencies[int(total * 0.99)] * 1000:7.2f} ms  "
+          f"errors {sum(errors)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent write benchmark: per-call connections vs single writer")
+    parser.add_argument("--writers", type=int, default=24)
+    parser.add_argument("--writes", type=int, default=200, help="writes per writer thread")
+    args = parser.parse_args()
+
+    for mode in ("direct", "writer"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = os.path.join(tmp, "bench.db")
+            _setup(db_name, wal=(mode == "writer"))
+            run(mode, args.writers, args.writes, db_name)
@@ -2,8 +2,11 @@ import pandas as pd
 import datetime
 from database_setup import create_connection, create_tables, insert_record
 
-def insert_from_df(df, table_name):
-    """Insert multiple rows from DataFrame into a specific table."""
+def insert_from_df(df, table_name, progress=None):
+    """Insert multiple rows from DataFrame into a specific table.
+
+    progress: optional callable receiving the fraction of rows processed (0.0 - 1.0).
+    """
 
     # Define converters for each table
     converters = {
@@ -50,8 +53,11 @@ def insert_from_df(df, table_name):
     table_converters = converters.get(table_name, {})
     expected_keys = list(table_converters.keys())
 
+    total_rows = len(df)
+    pending = []
+
     # Insert each row using insert_record
-    for _, row in df.iterrows():
+    for i, (_, row) in enumerate(df.iterrows(), start=1):
         data = row.to_dict()
         # Normalize keys to lowercase
         data = {k.lower(): v for k, v in data.items()}
@@ -90,7 +96,13 @@ def insert_from_df(df, table_name):
                     else:
                         data[k] = ""
         if data:
-            insert_record(table_name, data)
+            pending.append(insert_record(table_name, data, wait=False))
+        if progress and (i % 100 == 0 or i == total_rows):
+            progress(i / total_rows)
+
+    # Rows are queued to the single writer and group-committed; wait for all of them
+    for future in pending:
+        future.result()
 
     print(f"✅ CSV data inserted into {table_name}!")
 
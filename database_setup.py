@@ -1,4 +1,5 @@
 import sqlite3
+import threading
 
 DB_NAME = "trains.db"
 
@@ -9,124 +10,297 @@ def create_connection(db_name=DB_NAME):
     return connection
 
 
+def _change_counter_triggers(table):
+    """Triggers that bump table_versions for table on every insert, update and delete."""
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version AFTER {event} ON {table}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+        END
+        """
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+# Versioned schema migrations: (version, [statements]). Append new versions, never edit old ones.
+MIGRATIONS = [
+    (1, [
+        # Master train list
+        """
+        CREATE TABLE IF NOT EXISTS trains (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_number TEXT UNIQUE NOT NULL,
+            description TEXT
+        )
+        """,
+        # Fitness certificates
+        """
+        CREATE TABLE IF NOT EXISTS fitness_certificates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            certificate_status TEXT,
+            valid_till DATE,
+            issued_by TEXT,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Job cards
+        """
+        CREATE TABLE IF NOT EXISTS job_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            job_card_no TEXT,
+            status TEXT,
+            source_system TEXT,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Branding
+        """
+        CREATE TABLE IF NOT EXISTS branding_priorities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            priority_level TEXT,
+            campaign_name TEXT,
+            exposure_hours REAL,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Mileage
+        """
+        CREATE TABLE IF NOT EXISTS mileage_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            total_km REAL,
+            last_updated DATE,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Cleaning
+        """
+        CREATE TABLE IF NOT EXISTS cleaning_slots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            slot_name TEXT,
+            scheduled_time TEXT,
+            status TEXT,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Depot positions
+        """
+        CREATE TABLE IF NOT EXISTS depot_positions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            train_id INTEGER,
+            depot_name TEXT,
+            position_code TEXT,
+            FOREIGN KEY (train_id) REFERENCES trains(id)
+        )
+        """,
+        # Background jobs (ingestion, simulation)
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            payload TEXT,
+            result TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        """,
+    ]),
+    (2, [
+        # Nightly plan history: one compact row per night and train
+        """
+        CREATE TABLE IF NOT EXISTS plan_history (
+            plan_date TEXT NOT NULL,
+            train_id INTEGER NOT NULL,
+            decision INTEGER NOT NULL,
+            issue_mask INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (plan_date, train_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_plan_history_train ON plan_history (train_id, plan_date)",
+        # Per-night plan metrics and scenario parameters
+        """
+        CREATE TABLE IF NOT EXISTS plan_nights (
+            plan_date TEXT PRIMARY KEY,
+            punctuality REAL,
+            cost REAL,
+            safety_score REAL,
+            advertiser_exposure REAL,
+            inducted INTEGER,
+            standby INTEGER,
+            held INTEGER,
+            params TEXT,
+            recorded_at TEXT
+        )
+        """,
+    ]),
+    (3, [
+        # Per-train lookups used by depot-partitioned queries
+        "CREATE INDEX IF NOT EXISTS idx_fitness_train ON fitness_certificates (train_id)",
+        "CREATE INDEX IF NOT EXISTS idx_job_cards_train ON job_cards (train_id)",
+        "CREATE INDEX IF NOT EXISTS idx_branding_train ON branding_priorities (train_id)",
+        "CREATE INDEX IF NOT EXISTS idx_mileage_train ON mileage_records (train_id)",
+        "CREATE INDEX IF NOT EXISTS idx_cleaning_train ON cleaning_slots (train_id)",
+        "CREATE INDEX IF NOT EXISTS idx_depot_positions_train ON depot_positions (train_id, id)",
+        # Current depot of each train (latest depot_positions row)
+        """
+        CREATE VIEW IF NOT EXISTS train_depots AS
+        SELECT dp.train_id, dp.depot_name
+        FROM depot_positions dp
+        WHERE dp.id = (SELECT MAX(id) FROM depot_positions WHERE train_id = dp.train_id)
+        """,
+    ]),
+    (4, [
+        # Branding contracts: exposure target over a campaign window
+        """
+        CREATE TABLE IF NOT EXISTS branding_campaigns (
+            campaign_name TEXT PRIMARY KEY,
+            target_hours REAL NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL
+        )
+        """,
+        # Exposure ledger: hours accrued per campaign, train and night
+        """
+        CREATE TABLE IF NOT EXISTS exposure_ledger (
+            campaign_name TEXT NOT NULL,
+            train_id INTEGER NOT NULL,
+            accrual_date DATE NOT NULL,
+            hours REAL NOT NULL,
+            PRIMARY KEY (campaign_name, accrual_date, train_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_exposure_ledger_date ON exposure_ledger (accrual_date)",
+        # Per-campaign daily totals with running (prefix) sums
+        """
+        CREATE TABLE IF NOT EXISTS campaign_exposure_daily (
+            campaign_name TEXT NOT NULL,
+            accrual_date DATE NOT NULL,
+            hours REAL NOT NULL,
+            cumulative_hours REAL NOT NULL,
+            PRIMARY KEY (campaign_name, accrual_date)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (5, [
+        # train_depots: a latest position with no depot name means the train is unassigned
+        "DROP VIEW IF EXISTS train_depots",
+        """
+        CREATE VIEW train_depots AS
+        SELECT dp.train_id, dp.depot_name
+        FROM depot_positions dp
+        WHERE dp.id = (SELECT MAX(id) FROM depot_positions WHERE train_id = dp.train_id)
+          AND dp.train_id IS NOT NULL
+          AND TRIM(COALESCE(dp.depot_name, '')) != ''
+        """,
+    ]),
+    (6, [
+        # Ingest jobs used to store the whole uploaded CSV in payload; keep only table and row count
+        """
+        UPDATE jobs
+        SET payload = json_object('table', json_extract(payload, '$.table'),
+                                  'rows', json_array_length(payload, '$.rows'))
+        WHERE kind = 'ingest' AND json_valid(payload) AND json_type(payload, '$.rows') = 'array'
+        """,
+    ]),
+    (7, [
+        # Change counters for the tables the failure model reads (any write from any connection bumps them)
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO table_versions (table_name)
+        VALUES ('trains'), ('job_cards'), ('mileage_records'), ('fitness_certificates'), ('cleaning_slots')
+        """,
+        *_change_counter_triggers("trains"),
+        *_change_counter_triggers("job_cards"),
+        *_change_counter_triggers("mileage_records"),
+        *_change_counter_triggers("fitness_certificates"),
+        *_change_counter_triggers("cleaning_slots"),
+    ]),
+]
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def get_schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(db_name=DB_NAME):
+    """Apply pending migrations. Runs at most once per process per database."""
+    if db_name in _migrated:
+        return
+    with _migrate_lock:
+        if db_name in _migrated:
+            return
+        conn = create_connection(db_name)
+        # WAL lets readers keep snapshots while the single writer commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        current = get_schema_version(conn)
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            conn.commit()
+        conn.close()
+        _migrated.add(db_name)
+
+
 def create_tables():
     """Create all required tables for the project."""
-    conn = create_connection()
-    cursor = conn.cursor()
-
-    # Master train list
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS trains (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_number TEXT UNIQUE NOT NULL,
-        description TEXT
-    )
-    """)
-
-    # Fitness certificates
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS fitness_certificates (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        certificate_status TEXT,
-        valid_till DATE,
-        issued_by TEXT,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    # Job cards
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS job_cards (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        job_card_no TEXT,
-        status TEXT,
-        source_system TEXT,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    # Branding
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS branding_priorities (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        priority_level TEXT,
-        campaign_name TEXT,
-        exposure_hours REAL,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    # Mileage
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS mileage_records (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        total_km REAL,
-        last_updated DATE,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    # Cleaning
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS cleaning_slots (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        slot_name TEXT,
-        scheduled_time TEXT,
-        status TEXT,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    # Depot positions
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS depot_positions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        train_id INTEGER,
-        depot_name TEXT,
-        position_code TEXT,
-        FOREIGN KEY (train_id) REFERENCES trains(id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    migrate()
 
 
-# Insert helpers
+# Insert helpers (all writes go through the single writer in db_writer)
 def insert_train(train_number, description=""):
-    conn = create_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO trains (train_number, description) VALUES (?, ?)",
-                (train_number, description))
-    conn.commit()
-    conn.close()
+    from db_writer import get_writer
 
+    get_writer().submit("INSERT OR IGNORE INTO trains (train_number, description) VALUES (?, ?)",
+                        (train_number, description)).result()
+
+
+def insert_record(table, data: dict, wait=True):
+    """Generic insert into any table by dict. With wait=False, returns a Future instead of blocking."""
+    from db_writer import get_writer
 
-def insert_record(table, data: dict):
-    """Generic insert into any table by dict."""
-    conn = create_connection()
-    cur = conn.cursor()
     cols = ", ".join(data.keys())
     placeholders = ", ".join(["?"] * len(data))
     sql = f"INSERT OR IGNORE INTO {table} ({cols}) VALUES ({placeholders})"
-    cur.execute(sql, tuple(data.values()))
-    conn.commit()
-    conn.close()
+    future = get_writer().submit(sql, tuple(data.values()))
+    if wait:
+        return future.result()
+    return future
 
 
-def fetch_all(table):
-    conn = create_connection()
+def fetch_all(table, where=None, args=(), db_name=DB_NAME):
+    """Fetch rows of a table as dicts, optionally filtered by a WHERE clause with bound args."""
+    conn = create_connection(db_name)
     cur = conn.cursor()
     # Get column names
     cur.execute(f"PRAGMA table_info({table})")
     columns = [row[1] for row in cur.fetchall()]
     # Get data
-    cur.execute(f"SELECT * FROM {table}")
+    sql = f"SELECT * FROM {table}"
+    if where:
+        sql += f" WHERE {where}"
+    cur.execute(sql, args)
     rows = cur.fetchall()
     conn.close()
     # Return as list of dicts
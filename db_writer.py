@@ -0,0 +1,130 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from database_setup import DB_NAME
+
+MAX_GROUP = 512  # Max writes coalesced into one commit
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class DBWriter:
+    """
+    Single writer for one SQLite database: one connection owned by one thread.
+    Queued writes are coalesced into group commits (each write in its own savepoint,
+    so a failing write does not roll back the others). Readers keep using their own
+    connections and read WAL snapshots.
+    """
+
+    def __init__(self, db_name=DB_NAME, max_group=MAX_GROUP):
+        self.db_name = db_name
+        self.max_group = max_group
+        self.error = None
+        self._queue = queue.Queue()
+        self._state_lock = threading.Lock()
+        self._dead = False
+        self._thread = threading.Thread(target=self._run, name=f"db-writer:{db_name}", daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return not self._dead and self._thread.is_alive()
+
+    def submit_call(self, fn):
+        """Queue fn(cursor) to run inside the writer's transaction. Returns a Future of its result."""
+        future = Future()
+        with self._state_lock:
+            if self._dead:
+                future.set_exception(RuntimeError(f"DB writer for {self.db_name} stopped: {self.error}"))
+                return future
+            self._queue.put((fn, future))
+        return future
+
+    def submit(self, sql, args=()):
+        """Queue one statement. Returns a Future of the cursor's lastrowid."""
+        def run(cur):
+            cur.execute(sql, args)
+            return cur.lastrowid
+        return self.submit_call(run)
+
+    def submit_many(self, sql, seq_of_args):
+        """Queue an executemany. Returns a Future of the affected row count."""
+        def run(cur):
+            cur.executemany(sql, seq_of_args)
+            return cur.rowcount
+        return self.submit_call(run)
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.db_name, isolation_level=None, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                self._serve(conn)
+            finally:
+                conn.close()
+        except BaseException as e:
+            self._shutdown(e)
+
+    def _shutdown(self, error):
+        """Mark the writer dead and fail every write still queued, so no caller blocks forever."""
+        with self._state_lock:
+            self._dead = True
+            self.error = error
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"DB writer for {self.db_name} stopped: {error}"))
+
+    def _serve(self, conn):
+        cur = conn.cursor()
+        while True:
+            group = [self._queue.get()]
+            while len(group) < self.max_group:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Skip writes whose caller cancelled them while queued
+            group = [(fn, future) for fn, future in group if future.set_running_or_notify_cancel()]
+            if not group:
+                continue
+
+            outcomes = []
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                for fn, future in group:
+                    cur.execute("SAVEPOINT write")
+                    try:
+                        outcomes.append((future, fn(cur), None))
+                        cur.execute("RELEASE write")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO write")
+                        cur.execute("RELEASE write")
+                        outcomes.append((future, None, e))
+                cur.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                outcomes = [(future, None, e) for _, future in group]
+
+            # Resolve only after the commit so callers see durable writes
+            for future, result, error in outcomes:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+
+def get_writer(db_name=DB_NAME):
+    """The process-wide writer for db_name (started on first use)."""
+    with _writers_lock:
+        writer = _writers.get(db_name)
+        if writer is None or not writer.is_alive():
+            # First use, or the previous writer died (e.g. the database could not be opened)
+            writer = _writers[db_name] = DBWriter(db_name)
+        return writer
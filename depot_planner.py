@@ -0,0 +1,169 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from database_setup import DB_NAME, create_connection, fetch_all, migrate
+from simulation import compute_train_statuses, select_candidates, compute_metrics, compute_signals, apply_signals
+
+UNASSIGNED = "Unassigned"
+# Trains with no current depot (no position, or a latest position without a depot name)
+UNASSIGNED_MEMBERS = "NOT IN (SELECT train_id FROM train_depots WHERE train_id IS NOT NULL)"
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(depot_count):
+    """Process-wide worker processes for per-depot planning (one per depot, at most one per CPU)."""
+    global _pool, _pool_size
+    workers = max(1, min(depot_count, os.cpu_count() or 1))
+    with _pool_lock:
+        if _pool is not None and _pool_size < workers:
+            # More depots than workers: replace the pool with a larger one
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            # Spawn, not fork: the pool is created from a job thread while the DB writer and
+            # other threads may hold locks, which a forked child would inherit already held.
+            # Spawned workers import the main script as __mp_main__ (app_ui guards its UI).
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+        return _pool
+
+
+def _reset_pool(pool):
+    """Drop a broken pool so the next run starts fresh worker processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def fetch_depot_names(db_name=DB_NAME):
+    """Depots that currently hold at least one train (plus Unassigned if any train has no position)."""
+    migrate(db_name)
+    conn = create_connection(db_name)
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT depot_name FROM train_depots ORDER BY depot_name")
+    depots = [row[0] for row in cur.fetchall()]
+    cur.execute(f"SELECT COUNT(*) FROM trains WHERE id {UNASSIGNED_MEMBERS}")
+    if cur.fetchone()[0]:
+        depots.append(UNASSIGNED)
+    conn.close()
+    return depots
+
+
+def fetch_depot_data(depot_name, db_name=DB_NAME):
+    """Partitioned fetch: only the rows belonging to trains currently at depot_name."""
+    if depot_name == UNASSIGNED:
+        members = UNASSIGNED_MEMBERS
+        args = ()
+    else:
+        members = "IN (SELECT train_id FROM train_depots WHERE depot_name = ?)"
+        args = (depot_name,)
+    data = {'trains': fetch_all("trains", f"id {members}", args, db_name)}
+    for table in ("fitness_certificates", "job_cards", "cleaning_slots", "branding_priorities"):
+        data[table] = fetch_all(table, f"train_id {members}", args, db_name)
+    return data
+
+
+def plan_depot(depot_name, params, signals, db_name=DB_NAME):
+    """
+    Readiness and candidate ranking for one depot (runs in a worker process).
+    signals: fleet-wide ranking signals from compute_signals, computed once by the coordinator.
+    """
+    data = fetch_depot_data(depot_name, db_name)
+    train_statuses = compute_train_statuses(data['trains'], data['fitness_certificates'],
+                                            data['job_cards'], data['cleaning_slots'])
+    for ts in train_statuses:
+        ts['depot'] = depot_name
+    apply_signals(train_statuses, signals)
+    candidates = select_candidates(train_statuses, data['branding_priorities'], params)
+    return {
+        'depot': depot_name,
+        'train_count': len(train_statuses),
+        'train_statuses': train_statuses,
+        'candidates': candidates
+    }
+
+
+def allocate_quotas(target, depot_plans):
+    """
+    Split the fleet-wide induction target across depots.
+    Quotas are proportional to depot size (largest remainder), capped by each depot's
+    candidates; any shortfall is moved to depots that still have spare candidates.
+    """
+    total_trains = sum(p['train_count'] for p in depot_plans)
+    if not total_trains:
+        return {p['depot']: 0 for p in depot_plans}
+
+    shares = {p['depot']: target * p['train_count'] / total_trains for p in depot_plans}
+    quotas = {d: int(share) for d, share in shares.items()}
+    remaining = target - sum(quotas.values())
+    for d in sorted(shares, key=lambda d: shares[d] - quotas[d], reverse=True)[:remaining]:
+        quotas[d] += 1
+
+    # Rebalance: cap at available candidates and hand the excess to depots with spare trains
+    available = {p['depot']: len(p['candidates']) for p in depot_plans}
+    shortfall = 0
+    for d in quotas:
+        if quotas[d] > available[d]:
+            shortfall += quotas[d] - available[d]
+            quotas[d] = available[d]
+    for d in sorted(quotas, key=lambda d: available[d] - quotas[d], reverse=True):
+        if not shortfall:
+            break
+        extra = min(shortfall, available[d] - quotas[d])
+        quotas[d] += extra
+        shortfall -= extra
+    return quotas
+
+
+def run_fleet_simulation(params, db_name=DB_NAME):
+    """
+    Run the induction simulation partitioned by depot.
+    The coordinator computes the fleet-wide ranking signals once, each depot is planned in
+    a separate worker process, and the coordinator merges the results and rebalances the
+    fleet-wide induction target across depots.
+    Returns: same shape as run_simulation, plus a per-depot summary.
+    """
+    depots = fetch_depot_names(db_name)
+    # Fleet-wide signals (failure model, campaign shortfalls) are computed once, not per depot
+    signals = compute_signals(fetch_all("branding_priorities", db_name=db_name), params, db_name)
+    if len(depots) > 1:
+        pool = _get_pool(len(depots))
+        try:
+            futures = [pool.submit(plan_depot, depot, params, signals, db_name) for depot in depots]
+            depot_plans = [f.result() for f in futures]
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            raise
+    else:
+        depot_plans = [plan_depot(depot, params, signals, db_name) for depot in depots]
+
+    train_statuses = [ts for p in depot_plans for ts in p['train_statuses']]
+    total_candidates = sum(len(p['candidates']) for p in depot_plans)
+    target = min(params.get('min_induction_count', total_candidates), total_candidates)
+    quotas = allocate_quotas(target, depot_plans)
+
+    selected = []
+    depot_summary = []
+    for p in depot_plans:
+        depot_selected = p['candidates'][:quotas[p['depot']]]
+        selected.extend(depot_selected)
+        depot_summary.append({
+            'depot': p['depot'],
+            'trains': p['train_count'],
+            'ready': len(p['candidates']),
+            'selected': len(depot_selected)
+        })
+
+    return {
+        'selected_trains': selected,
+        'train_statuses': train_statuses,
+        'depots': depot_summary,
+        'metrics': compute_metrics(selected, len(train_statuses), params)
+    }
@@ -0,0 +1,164 @@
+import datetime
+from database_setup import DB_NAME, create_connection, migrate
+from db_writer import get_writer
+
+SERVICE_HOURS_PER_NIGHT = 16.0  # Revenue hours an inducted train runs the following day
+SHORTFALL_LOOKBACK_DAYS = 7  # Window for the recent delivery rate used in projections
+
+
+def _to_date(d):
+    return d if isinstance(d, datetime.date) else datetime.date.fromisoformat(str(d))
+
+
+def upsert_campaign(campaign_name, target_hours, start_date, end_date, db_name=DB_NAME):
+    """Create or update a campaign's contracted exposure target and window."""
+    migrate(db_name)
+    get_writer(db_name).submit(
+        "INSERT OR REPLACE INTO branding_campaigns (campaign_name, target_hours, start_date, end_date) "
+        "VALUES (?, ?, ?, ?)",
+        (campaign_name, float(target_hours), str(_to_date(start_date)), str(_to_date(end_date)))
+    ).result()
+
+
+def fetch_campaigns(db_name=DB_NAME):
+    conn = create_connection(db_name)
+    cur = conn.cursor()
+    cur.execute("SELECT campaign_name, target_hours, start_date, end_date FROM branding_campaigns "
+                "ORDER BY campaign_name")
+    campaigns = [{'campaign_name': c, 'target_hours': t, 'start_date': s, 'end_date': e}
+                 for c, t, s, e in cur.fetchall()]
+    conn.close()
+    return campaigns
+
+
+def accrue_exposure(accrual_date, selected_trains, hours_per_train=SERVICE_HOURS_PER_NIGHT, db_name=DB_NAME):
+    """
+    Record one night's exposure: every inducted train accrues hours_per_train for each
+    campaign it carries. Re-accruing a date replaces that date's entries. The campaign's
+    daily row and the running sums after it are adjusted by the change.
+    """
+    migrate(db_name)
+    accrual_date = str(_to_date(accrual_date))
+    train_ids = sorted({ts['id'] for ts in selected_trains})
+
+    def write(cur):
+        placeholders = ", ".join("?" * len(train_ids))
+        rows = []
+        if train_ids:
+            cur.execute(f"SELECT DISTINCT train_id, campaign_name FROM branding_priorities "
+                        f"WHERE train_id IN ({placeholders}) AND campaign_name IS NOT NULL AND campaign_name != ''",
+                        train_ids)
+            rows = [(campaign, train_id, accrual_date, hours_per_train) for train_id, campaign in cur.fetchall()]
+
+        cur.execute("SELECT DISTINCT campaign_name FROM exposure_ledger WHERE accrual_date = ?", (accrual_date,))
+        campaigns = {row[0] for row in cur.fetchall()} | {row[0] for row in rows}
+        cur.execute("DELETE FROM exposure_ledger WHERE accrual_date = ?", (accrual_date,))
+        cur.executemany("INSERT INTO exposure_ledger (campaign_name, train_id, accrual_date, hours) "
+                        "VALUES (?, ?, ?, ?)", rows)
+
+        for campaign in campaigns:
+            cur.execute("SELECT TOTAL(hours) FROM exposure_ledger WHERE campaign_name = ? AND accrual_date = ?",
+                        (campaign, accrual_date))
+            daily = cur.fetchone()[0]
+            cur.execute("SELECT hours FROM campaign_exposure_daily WHERE campaign_name = ? AND accrual_date = ?",
+                        (campaign, accrual_date))
+            row = cur.fetchone()
+            old_daily = row[0] if row else 0.0
+            cur.execute("SELECT cumulative_hours FROM campaign_exposure_daily "
+                        "WHERE campaign_name = ? AND accrual_date < ? ORDER BY accrual_date DESC LIMIT 1",
+                        (campaign, accrual_date))
+            row = cur.fetchone()
+            previous = row[0] if row else 0.0
+
+            cur.execute("INSERT OR REPLACE INTO campaign_exposure_daily "
+                        "(campaign_name, accrual_date, hours, cumulative_hours) VALUES (?, ?, ?, ?)",
+                        (campaign, accrual_date, daily, previous + daily))
+            # Back-filled nights shift every later running sum
+            if daily != old_daily:
+                cur.execute("UPDATE campaign_exposure_daily SET cumulative_hours = cumulative_hours + ? "
+                            "WHERE campaign_name = ? AND accrual_date > ?",
+                            (daily - old_daily, campaign, accrual_date))
+
+    get_writer(db_name).submit_call(write).result()
+
+
+class ExposureIndex:
+    """
+    In-memory prefix sums per campaign, one slot per calendar day from the first accrual,
+    so hours delivered between any two dates is a constant-time lookup.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self._prefix = {}
+        conn = create_connection(db_name)
+        cur = conn.cursor()
+        cur.execute("SELECT campaign_name, accrual_date, cumulative_hours FROM campaign_exposure_daily "
+                    "ORDER BY campaign_name, accrual_date")
+        for campaign, accrual_date, cumulative in cur.fetchall():
+            day = _to_date(accrual_date)
+            if campaign not in self._prefix:
+                self._prefix[campaign] = (day, [cumulative])
+                continue
+            first_day, sums = self._prefix[campaign]
+            # Forward-fill days without accrual
+            gap = (day - first_day).days - len(sums)
+            sums.extend([sums[-1]] * gap)
+            sums.append(cumulative)
+        conn.close()
+
+    def cumulative_until(self, campaign_name, day):
+        """Hours delivered from the first accrual up to and including day."""
+        if campaign_name not in self._prefix:
+            return 0.0
+        first_day, sums = self._prefix[campaign_name]
+        offset = (_to_date(day) - first_day).days
+        if offset < 0:
+            return 0.0
+        return sums[min(offset, len(sums) - 1)]
+
+    def hours_between(self, campaign_name, start_date, end_date):
+        """Hours delivered between two dates, inclusive."""
+        start = _to_date(start_date) - datetime.timedelta(days=1)
+        return self.cumulative_until(campaign_name, end_date) - self.cumulative_until(campaign_name, start)
+
+
+def campaign_shortfalls(as_of=None, lookback_days=SHORTFALL_LOOKBACK_DAYS, db_name=DB_NAME):
+    """
+    Delivered vs target per campaign, and the projected shortfall at the end of the window
+    if the recent daily delivery rate continues. Campaigns that have not started yet report
+    no delivery and no shortfall. Ended campaigns report their final shortfall; 'active' is
+    False for both, and only active campaigns should drive induction priority.
+    Returns: {campaign_name: dict}
+    """
+    migrate(db_name)
+    as_of = _to_date(as_of or datetime.date.today())
+    index = ExposureIndex(db_name)
+
+    result = {}
+    for c in fetch_campaigns(db_name):
+        start, end = _to_date(c['start_date']), _to_date(c['end_date'])
+        started = as_of >= start
+        if started:
+            until = min(as_of, end)
+            delivered = max(index.hours_between(c['campaign_name'], start, until), 0.0)
+            window_start = max(start, until - datetime.timedelta(days=lookback_days - 1))
+            window_days = (until - window_start).days + 1
+            rate = index.hours_between(c['campaign_name'], window_start, until) / window_days
+            remaining_days = max((end - as_of).days, 0)
+        else:
+            # Window not open yet: every day from start to end is still ahead
+            delivered, rate = 0.0, 0.0
+            remaining_days = (end - start).days + 1
+        projected = delivered + rate * remaining_days
+        shortfall = max(c['target_hours'] - projected, 0.0) if started else 0.0
+        result[c['campaign_name']] = {
+            'target_hours': c['target_hours'],
+            'started': started,
+            'active': started and as_of <= end,
+            'delivered_hours': round(delivered, 2),
+            'daily_rate': round(max(rate, 0.0), 2),
+            'remaining_days': remaining_days,
+            'projected_hours': round(projected, 2),
+            'shortfall_hours': round(shortfall, 2)
+        }
+    return result
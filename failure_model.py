@@ -0,0 +1,187 @@
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from database_setup import DB_NAME, create_connection, migrate
+
+FEATURES = [
+    "closed_jobs",
+    "closed_iot_jobs",
+    "total_km",
+    "days_since_mileage_update",
+    "cert_days_to_expiry",
+    "invalid_certs",
+    "pending_cleaning",
+]
+
+# Tables the features are built from; a feature block is rebuilt only when its table's
+# change counter (table_versions, bumped by triggers on every write) moves
+SOURCE_TABLES = ("trains", "job_cards", "mileage_records", "fitness_certificates", "cleaning_slots")
+
+
+def _read_sql(conn, sql):
+    return pd.read_sql_query(sql, conn)
+
+
+def _job_features(conn):
+    df = _read_sql(conn, "SELECT train_id, status, source_system FROM job_cards WHERE train_id IS NOT NULL")
+    closed = df['status'] == 'Closed'
+    return pd.DataFrame({
+        'closed_jobs': closed.groupby(df['train_id']).sum(),
+        'closed_iot_jobs': (closed & (df['source_system'] == 'IoT')).groupby(df['train_id']).sum(),
+        # Training label: train currently has an open job card (proxy for an in-service failure)
+        'label': (~closed).groupby(df['train_id']).any(),
+    })
+
+
+def _mileage_features(conn, today):
+    df = _read_sql(conn, "SELECT train_id, total_km, last_updated FROM mileage_records "
+                         "WHERE train_id IS NOT NULL ORDER BY id")
+    latest = df.groupby('train_id').last()
+    updated = pd.to_datetime(latest['last_updated'], errors='coerce')
+    return pd.DataFrame({
+        'total_km': latest['total_km'].astype(float),
+        'days_since_mileage_update': (pd.Timestamp(today) - updated).dt.days,
+    })
+
+
+def _certificate_features(conn, today):
+    df = _read_sql(conn, "SELECT train_id, certificate_status, valid_till FROM fitness_certificates "
+                         "WHERE train_id IS NOT NULL")
+    days_left = (pd.to_datetime(df['valid_till'], errors='coerce') - pd.Timestamp(today)).dt.days
+    return pd.DataFrame({
+        'cert_days_to_expiry': days_left.groupby(df['train_id']).min(),
+        'invalid_certs': (df['certificate_status'] != 'Valid').groupby(df['train_id']).sum(),
+    })
+
+
+def _cleaning_features(conn):
+    df = _read_sql(conn, "SELECT train_id, status FROM cleaning_slots WHERE train_id IS NOT NULL")
+    return pd.DataFrame({'pending_cleaning': (df['status'] != 'Done').groupby(df['train_id']).sum()})
+
+
+class LogisticModel:
+    """Small L2-regularised logistic regression trained by batch gradient descent (CPU, numpy only)."""
+
+    def __init__(self, l2=0.01, learning_rate=0.5, iterations=300):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.iterations = iterations
+        self.mean = self.std = self.weights = None
+        self.bias = 0.0
+
+    def fit(self, X, y):
+        self.mean = X.mean(axis=0)
+        self.std = X.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        Z = (X - self.mean) / self.std
+        self.weights = np.zeros(Z.shape[1])
+        self.bias = 0.0
+        for _ in range(self.iterations):
+            p = 1.0 / (1.0 + np.exp(-(Z @ self.weights + self.bias)))
+            error = p - y
+            self.weights -= self.learning_rate * (Z.T @ error / len(y) + self.l2 * self.weights)
+            self.bias -= self.learning_rate * error.mean()
+        return self
+
+    def predict_proba(self, X):
+        Z = (X - self.mean) / self.std
+        return 1.0 / (1.0 + np.exp(-(Z @ self.weights + self.bias)))
+
+
+class FailureModel:
+    """
+    Per-train failure risk from job-card history, mileage, certificate age and cleaning backlog.
+    Feature blocks are cached per source table and rebuilt only when that table changes;
+    the model is retrained only when any feature block was rebuilt.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._fingerprints = {}
+        self._blocks = {}
+        self._features = None
+        self._model = None
+        self._base_rate = 0.0
+        self._risks = {}
+        self._lock = threading.Lock()
+
+    def _refresh_features(self, conn):
+        """Rebuild changed feature blocks. Returns True if anything changed."""
+        today = datetime.date.today()
+        builders = {
+            "job_cards": lambda: _job_features(conn),
+            "mileage_records": lambda: _mileage_features(conn, today),
+            "fitness_certificates": lambda: _certificate_features(conn, today),
+            "cleaning_slots": lambda: _cleaning_features(conn),
+        }
+        versions = dict(conn.execute("SELECT table_name, version FROM table_versions").fetchall())
+        changed = False
+        for table in SOURCE_TABLES:
+            fingerprint = (versions.get(table), today)
+            if self._fingerprints.get(table) == fingerprint:
+                continue
+            self._fingerprints[table] = fingerprint
+            if table in builders:
+                self._blocks[table] = builders[table]()
+            changed = True
+
+        if changed:
+            train_ids = _read_sql(conn, "SELECT id FROM trains")['id']
+            features = pd.DataFrame(index=pd.Index(train_ids, name='train_id'))
+            for block in self._blocks.values():
+                features = features.join(block, how='left')
+            features = features.reindex(columns=FEATURES + ['label'])
+            # Missing mileage / certificate data counts as stale / expired
+            features['days_since_mileage_update'] = features['days_since_mileage_update'].fillna(365)
+            features['cert_days_to_expiry'] = features['cert_days_to_expiry'].fillna(-1)
+            self._features = features.fillna(0)
+        return changed
+
+    def _train(self):
+        X = self._features[FEATURES].to_numpy(dtype=float)
+        y = self._features['label'].to_numpy(dtype=float)
+        self._base_rate = float(y.mean()) if len(y) else 0.0
+        # Needs both classes to learn anything; otherwise fall back to the base rate
+        self._model = LogisticModel().fit(X, y) if 0 < y.sum() < len(y) else None
+
+    def _score(self):
+        X = self._features[FEATURES].to_numpy(dtype=float)
+        if self._model is not None:
+            risk = self._model.predict_proba(X)
+        else:
+            risk = np.full(len(X), self._base_rate)
+        self._risks = dict(zip(self._features.index.tolist(), np.round(risk, 4).tolist()))
+
+    def predict(self):
+        """Return {train_id: failure risk 0-1} for the whole fleet."""
+        migrate(self.db_name)
+        with self._lock:
+            conn = create_connection(self.db_name)
+            try:
+                if self._refresh_features(conn):
+                    self._train()
+                    self._score()
+            finally:
+                conn.close()
+            return self._risks
+
+    def feature_table(self):
+        """Current feature matrix (one row per train) with the predicted risk."""
+        risks = self.predict()
+        table = self._features[FEATURES].copy()
+        table['failure_risk'] = table.index.map(risks)
+        return table
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def predict_failure_risk(db_name=DB_NAME):
+    """Fleet-wide failure risk, using the process-wide cached model for db_name."""
+    with _models_lock:
+        if db_name not in _models:
+            _models[db_name] = FailureModel(db_name)
+        model = _models[db_name]
+    return model.predict()
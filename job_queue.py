@@ -0,0 +1,148 @@
+import json
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database_setup import create_connection
+from db_writer import get_writer
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MAX_WORKERS = 2
+JOB_RETENTION_DAYS = 30  # Finished jobs older than this are deleted
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _get_executor():
+    """Process-wide worker pool, shared by every Streamlit session."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            recover_jobs()
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job-worker")
+        return _executor
+
+
+def _update_job(job_id, **fields):
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    get_writer().submit(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id)).result()
+
+
+def report_progress(job_id, progress, message=""):
+    """Record progress (0.0 - 1.0) for a running job."""
+    _update_job(job_id, progress=round(float(progress), 4), message=message)
+
+
+# Job handlers: each takes (job_id, payload) and returns a JSON-serialisable result
+def _run_ingest(job_id, payload):
+    import pandas as pd
+    from csv_to_db import insert_from_df
+
+    df = pd.DataFrame(payload["rows"])
+    table = payload["table"]
+    insert_from_df(df, table, progress=lambda p: report_progress(job_id, p, f"Inserting into {table}"))
+    return {"table": table, "rows": len(df)}
+
+
+def _run_simulation(job_id, payload):
+    report_progress(job_id, 0.1, "Running simulation")
+    if payload["params"].get("per_depot"):
+        from depot_planner import run_fleet_simulation
+        result = run_fleet_simulation(payload["params"])
+    else:
+        from simulation import run_simulation, fetch_fleet_data
+        from sensitivity import rank_fixes
+
+        # Rank fixes against the same rows and params, so the deltas match this run's selection
+        data = fetch_fleet_data()
+        result = run_simulation(payload["params"], data)
+        report_progress(job_id, 0.6, "Ranking fixes")
+        result["fix_first"] = rank_fixes(payload["params"], data, result)
+        del result["candidates"]  # Only needed as the fix-first baseline
+    if payload.get("plan_date"):
+        from plan_history import record_plan
+        from exposure_ledger import accrue_exposure
+
+        report_progress(job_id, 0.9, "Recording plan")
+        record_plan(payload["plan_date"], result, payload["params"])
+        accrue_exposure(payload["plan_date"], result["selected_trains"])
+    # Every train's status is only needed for the plan record; the UI shows the selection
+    del result["train_statuses"]
+    return result
+
+
+HANDLERS = {
+    "ingest": _run_ingest,
+    "simulation": _run_simulation,
+}
+
+
+def _stored_payload(kind, payload):
+    """What is kept in jobs.payload: ingest rows are only needed in memory, so store just their count."""
+    if kind == "ingest":
+        return {"table": payload["table"], "rows": len(payload["rows"])}
+    return payload
+
+
+def _execute(job_id, kind, payload):
+    _update_job(job_id, status=RUNNING, started_at=_now())
+    try:
+        result = HANDLERS[kind](job_id, payload)
+    except Exception as e:
+        _update_job(job_id, status=FAILED, message=str(e), finished_at=_now())
+        return
+    _update_job(job_id, status=DONE, progress=1.0, result=json.dumps(result, default=str),
+                finished_at=_now())
+
+
+def submit_job(kind, payload):
+    """Queue a job for the background workers and return its id."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    executor = _get_executor()
+    prune_jobs()
+    job_id = get_writer().submit(
+        "INSERT INTO jobs (kind, status, progress, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, PENDING, 0.0, json.dumps(_stored_payload(kind, payload), default=str), _now())
+    ).result()
+    executor.submit(_execute, job_id, kind, payload)
+    return job_id
+
+
+def get_job(job_id):
+    """Fetch a job as a dict (result decoded), or None if it does not exist."""
+    conn = create_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, kind, status, progress, message, result, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,))
+    row = cur.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    columns = ["id", "kind", "status", "progress", "message", "result",
+               "created_at", "started_at", "finished_at"]
+    job = dict(zip(columns, row))
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def recover_jobs():
+    """Mark jobs left pending/running by a previous process as failed."""
+    get_writer().submit("UPDATE jobs SET status = ?, message = ?, finished_at = ? WHERE status IN (?, ?)",
+                        (FAILED, "Interrupted by restart", _now(), PENDING, RUNNING)).result()
+
+
+def prune_jobs(max_age_days=JOB_RETENTION_DAYS):
+    """Delete finished jobs (and their stored results) older than max_age_days."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    get_writer().submit("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                        (DONE, FAILED, cutoff)).result()
@@ -0,0 +1,160 @@
+import json
+import datetime
+from database_setup import DB_NAME, create_connection, migrate
+from db_writer import get_writer
+
+# Issue bitmask (one bit per readiness check in run_simulation)
+ISSUE_BITS = {
+    "Invalid/Expired Fitness": 1,
+    "Open Job Cards": 2,
+    "Pending Cleaning": 4,
+}
+
+# Nightly decisions
+INDUCTED = 0
+STANDBY = 1
+HELD = 2
+DECISION_NAMES = {INDUCTED: "Inducted", STANDBY: "Standby", HELD: "Held"}
+
+
+def issues_to_mask(issues):
+    mask = 0
+    for issue in issues:
+        mask |= ISSUE_BITS.get(issue, 0)
+    return mask
+
+
+def mask_to_issues(mask):
+    return [issue for issue, bit in ISSUE_BITS.items() if mask & bit]
+
+
+def _to_date_str(d):
+    return d.isoformat() if isinstance(d, datetime.date) else str(d)
+
+
+def record_plan(plan_date, result, params=None, db_name=DB_NAME):
+    """Store a run_simulation result as the plan for plan_date (replaces any earlier plan for that night)."""
+    migrate(db_name)
+    plan_date = _to_date_str(plan_date)
+    selected_ids = {ts['id'] for ts in result['selected_trains']}
+
+    rows = []
+    for ts in result['train_statuses']:
+        if ts['id'] in selected_ids:
+            decision = INDUCTED
+        elif ts['status'] == "Passed Checks":
+            decision = STANDBY
+        else:
+            decision = HELD
+        rows.append((plan_date, ts['id'], decision, issues_to_mask(ts['issues'])))
+
+    counts = {d: 0 for d in DECISION_NAMES}
+    for row in rows:
+        counts[row[2]] += 1
+    metrics = result['metrics']
+
+    def write(cur):
+        cur.execute("DELETE FROM plan_history WHERE plan_date = ?", (plan_date,))
+        cur.executemany(
+            "INSERT INTO plan_history (plan_date, train_id, decision, issue_mask) VALUES (?, ?, ?, ?)", rows)
+        cur.execute(
+            "INSERT OR REPLACE INTO plan_nights (plan_date, punctuality, cost, safety_score, advertiser_exposure, "
+            "inducted, standby, held, params, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (plan_date, metrics['punctuality'], metrics['cost'], metrics['safety_score'],
+             metrics['advertiser_exposure'], counts[INDUCTED], counts[STANDBY], counts[HELD],
+             json.dumps(params or {}), datetime.datetime.now().isoformat(timespec="seconds"))
+        )
+
+    get_writer(db_name).submit_call(write).result()
+
+
+def get_plan(plan_date, db_name=DB_NAME):
+    """Return {train_id: (decision, issue_mask)} for one night."""
+    conn = create_connection(db_name)
+    cur = conn.cursor()
+    cur.execute("SELECT train_id, decision, issue_mask FROM plan_history WHERE plan_date = ?",
+                (_to_date_str(plan_date),))
+    plan = {train_id: (decision, mask) for train_id, decision, mask in cur.fetchall()}
+    conn.close()
+    return plan
+
+
+def diff_plans(date_a, date_b, db_name=DB_NAME):
+    """
+    Compare the plans of two nights.
+    Returns: list of dicts, one per train whose decision or issues changed, with the reason.
+    """
+    plan_a = get_plan(date_a, db_name)
+    plan_b = get_plan(date_b, db_name)
+
+    changes = []
+    for train_id in sorted(plan_a.keys() | plan_b.keys()):
+        before = plan_a.get(train_id)
+        after = plan_b.get(train_id)
+        if before == after:
+            continue
+        decision_a, mask_a = before if before else (None, 0)
+        decision_b, mask_b = after if after else (None, 0)
+        resolved = mask_to_issues(mask_a & ~mask_b)
+        raised = mask_to_issues(mask_b & ~mask_a)
+
+        if before is None:
+            reason = "Not in earlier plan"
+        elif after is None:
+            reason = "Not in later plan"
+        elif resolved or raised:
+            reason = "; ".join([f"{i} resolved" for i in resolved] + [f"{i} raised" for i in raised])
+        else:
+            reason = "Selection limit / priority"
+
+        changes.append({
+            'train_id': train_id,
+            'from': DECISION_NAMES.get(decision_a),
+            'to': DECISION_NAMES.get(decision_b),
+            'issues_resolved': resolved,
+            'issues_raised': raised,
+            'reason': reason
+        })
+    return changes
+
+
+def fetch_plan_range(start_date, end_date, db_name=DB_NAME):
+    """All per-train plan rows between two dates (inclusive), ordered by night."""
+    conn = create_connection(db_name)
+    cur = conn.cursor()
+    cur.execute("SELECT plan_date, train_id, decision, issue_mask FROM plan_history "
+                "WHERE plan_date BETWEEN ? AND ? ORDER BY plan_date, train_id",
+                (_to_date_str(start_date), _to_date_str(end_date)))
+    rows = [{'plan_date': d, 'train_id': t, 'decision': DECISION_NAMES[dec], 'issues': mask_to_issues(m)}
+            for d, t, dec, m in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def plan_kpis(start_date, end_date, db_name=DB_NAME):
+    """
+    KPI summary over a date range (inclusive).
+    Returns: dict with per-night metrics and per-train decision counts.
+    """
+    start_date, end_date = _to_date_str(start_date), _to_date_str(end_date)
+    conn = create_connection(db_name)
+    cur = conn.cursor()
+
+    cur.execute("SELECT plan_date, punctuality, cost, safety_score, advertiser_exposure, inducted, standby, held "
+                "FROM plan_nights WHERE plan_date BETWEEN ? AND ? ORDER BY plan_date", (start_date, end_date))
+    columns = ["plan_date", "punctuality", "cost", "safety_score", "advertiser_exposure",
+               "inducted", "standby", "held"]
+    nights = [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    cur.execute(f"""
+        SELECT train_id,
+               SUM(decision = {INDUCTED}), SUM(decision = {STANDBY}), SUM(decision = {HELD}),
+               SUM(issue_mask & {ISSUE_BITS['Open Job Cards']} != 0)
+        FROM plan_history WHERE plan_date BETWEEN ? AND ?
+        GROUP BY train_id
+    """, (start_date, end_date))
+    trains = [{'train_id': t, 'inducted': i, 'standby': s, 'held': h, 'nights_with_open_jobs': j}
+              for t, i, s, h, j in cur.fetchall()]
+    conn.close()
+
+    return {'nights': nights, 'trains': trains}
@@ -0,0 +1,143 @@
+import numpy as np
+from simulation import run_simulation, fetch_fleet_data, annotate_branding, candidate_sort_key
+
+BASE_COST_PER_TRAIN = 1000  # Same fixed cost as compute_metrics
+
+
+def _fixable_issues(train_statuses, jobs, cleaning):
+    """One entry per open job card / pending cleaning slot on a train, with whether fixing it clears the issue."""
+    status_by_train = {ts['id']: ts for ts in train_statuses}
+    open_jobs = [j for j in jobs if j['status'] != 'Closed' and j['train_id'] in status_by_train]
+    pending = [c for c in cleaning if c['status'] != 'Done' and c['train_id'] in status_by_train]
+
+    open_count, pending_count = {}, {}
+    for j in open_jobs:
+        open_count[j['train_id']] = open_count.get(j['train_id'], 0) + 1
+    for c in pending:
+        pending_count[c['train_id']] = pending_count.get(c['train_id'], 0) + 1
+
+    issues = []
+    for j in open_jobs:
+        issues.append({'train_id': j['train_id'], 'issue': "Open Job Cards", 'record_id': j['id'],
+                       'item': j['job_card_no'], 'clears_issue': open_count[j['train_id']] == 1})
+    for c in pending:
+        issues.append({'train_id': c['train_id'], 'issue': "Pending Cleaning", 'record_id': c['id'],
+                       'item': c['slot_name'], 'clears_issue': pending_count[c['train_id']] == 1})
+    return issues
+
+
+def rank_fixes(params, data=None, simulation=None):
+    """
+    "Fix-first" ranking: for every open job card and pending cleaning slot, the change in
+    run_simulation metrics if only that item were resolved tonight.
+    Deltas are computed incrementally from the baseline selection (no re-simulation):
+    a flipped train either stays a candidate (only its issue count changes) or becomes one,
+    in which case it is inserted at its priority position and may displace the last selected train.
+    data: optional pre-fetched rows (see fetch_fleet_data); pass the rows the simulation
+    used so the deltas match its selection.
+    simulation: optional result of run_simulation(params, data), reused as the baseline
+    instead of recomputing readiness, signals and candidates.
+    Returns: list of dicts sorted by punctuality gain, exposure gain, safety and cost.
+    """
+    if data is None:
+        data = fetch_fleet_data()
+    if simulation is None:
+        simulation = run_simulation(params, data)
+    train_statuses = simulation['train_statuses']
+    issues = _fixable_issues(train_statuses, data['job_cards'], data['cleaning_slots'])
+    if not issues:
+        return []
+
+    # Baseline
+    prioritize = params.get('prioritize_advertiser', False)
+    candidates = simulation['candidates']
+    limit = params.get('min_induction_count', len(train_statuses))
+    selected = simulation['selected_trains']
+    base = simulation['metrics']
+    total_trains = len(train_statuses)
+    penalty = params.get('cost_penalty_per_issue', 500)
+
+    # Rank every train as if it were a candidate, using the same ordering as select_candidates
+    if prioritize:
+        annotate_branding(train_statuses, data['branding_priorities'])
+    order_of = {ts['id']: pos for pos, ts in enumerate(
+        sorted(train_statuses, key=lambda ts: candidate_sort_key(ts, params)))}
+
+    def exposure_of(train_id):
+        if not prioritize:
+            return 0.0
+        return float(status_by_train[train_id]['exposure'] or 0)
+
+    status_by_train = {ts['id']: ts for ts in train_statuses}
+    candidate_ids = {ts['id'] for ts in candidates}
+    selected_ids = {ts['id'] for ts in selected}
+    candidate_keys = np.array(sorted(order_of[ts['id']] for ts in candidates), dtype=np.int64)
+
+    n = len(selected)
+    issue_sum = sum(ts['issue_count'] for ts in selected)
+    overridden = sum(1 for ts in selected if ts['issue_count'] > 0)
+    exposure = sum(ts.get('exposure', 0) for ts in selected)
+    full = len(candidates) >= limit
+    last = selected[-1] if selected and full else None
+    last_issues = last['issue_count'] if last else 0
+    last_overridden = 1 if last and last['issue_count'] > 0 else 0
+    last_exposure = last.get('exposure', 0) if last else 0.0
+
+    # Per-issue vectors
+    train_ids = np.array([i['train_id'] for i in issues])
+    old_count = np.array([status_by_train[t]['issue_count'] for t in train_ids])
+    new_count = old_count - np.array([i['clears_issue'] for i in issues], dtype=int)
+    was_candidate = np.array([t in candidate_ids for t in train_ids])
+    was_selected = np.array([t in selected_ids for t in train_ids])
+    keys = np.array([order_of[t] for t in train_ids], dtype=np.int64)
+    train_exposure = np.array([exposure_of(t) for t in train_ids])
+
+    risky = params.get('allow_risky_trains', False)
+    max_issues = params.get('max_issues_allowed', 1)
+    now_candidate = (new_count == 0) | (risky & (new_count <= max_issues))
+
+    # Newly eligible trains enter the candidate list at their priority position
+    enters = ~was_candidate & now_candidate & (np.searchsorted(candidate_keys, keys) < limit)
+    grows = enters & ~full
+    displaces = enters & full
+
+    d_n = grows.astype(int)
+    d_issue_sum = np.where(enters, new_count, 0) - np.where(displaces, last_issues, 0) \
+        - np.where(was_selected, old_count - new_count, 0)
+    d_overridden = np.where(enters, new_count > 0, 0) - np.where(displaces, last_overridden, 0) \
+        - np.where(was_selected & (old_count > 0) & (new_count == 0), 1, 0)
+    d_exposure = np.where(enters, train_exposure, 0.0) - np.where(displaces, last_exposure, 0.0)
+
+    new_n = n + d_n
+    punctuality = np.where(total_trains > 0, new_n / max(total_trains, 1) * 100, 0.0)
+    cost = new_n * BASE_COST_PER_TRAIN + (overridden + d_overridden) * penalty
+    safety = np.where(new_n > 0, (issue_sum + d_issue_sum) / np.maximum(new_n, 1), 0.0)
+    exposure_new = exposure + d_exposure
+
+    d_punctuality = np.round(punctuality - base['punctuality'], 2)
+    d_cost = cost - base['cost']
+    d_safety = np.round(safety - base['safety_score'], 2)
+    d_exposure = np.round(exposure_new - base['advertiser_exposure'], 2)
+
+    # Rank: punctuality gain, then exposure gain, then safety improvement, then lower cost
+    order = np.lexsort((d_cost, d_safety, -d_exposure, -d_punctuality))
+
+    ranked = []
+    for rank, i in enumerate(order, start=1):
+        issue = issues[i]
+        ts = status_by_train[issue['train_id']]
+        ranked.append({
+            'rank': rank,
+            'train_id': issue['train_id'],
+            'train_number': ts['train_number'],
+            'issue': issue['issue'],
+            'item': issue['item'],
+            'record_id': issue['record_id'],
+            'clears_issue': issue['clears_issue'],
+            'becomes_selected': bool(enters[i]),
+            'delta_punctuality': float(d_punctuality[i]) + 0.0,
+            'delta_cost': int(d_cost[i]),
+            'delta_safety_score': float(d_safety[i]) + 0.0,
+            'delta_advertiser_exposure': float(d_exposure[i]) + 0.0
+        })
+    return ranked
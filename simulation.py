@@ -1,39 +1,43 @@
 import sqlite3
 import pandas as pd
 import datetime
-from database_setup import fetch_all
+from collections import defaultdict
+from database_setup import DB_NAME, fetch_all
 
-def run_simulation(params):
-    """
-    Run the what-if simulation for train induction.
-    params: dict with scenario variables
-    Returns: dict with metrics and selected trains
-    """
-    # Fetch data
-    trains = fetch_all("trains")
-    fitness = fetch_all("fitness_certificates")
-    jobs = fetch_all("job_cards")
-    cleaning = fetch_all("cleaning_slots")
-    branding = fetch_all("branding_priorities")
+PRIORITY_ORDER = {'High': 3, 'Medium': 2, 'Low': 1}
+
+
+def _group_by_train(rows):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row['train_id']].append(row)
+    return grouped
+
+
+def compute_train_statuses(trains, fitness, jobs, cleaning):
+    """Readiness checks for each train. Returns a list of status dicts (one per train)."""
+    fitness_by_train = _group_by_train(fitness)
+    jobs_by_train = _group_by_train(jobs)
+    cleaning_by_train = _group_by_train(cleaning)
+    today = datetime.date.today()
 
-    # Compute base statuses
     train_statuses = []
     for train in trains:
         train_id = train['id']
         issues = []
 
         # Fitness check
-        fit = [f for f in fitness if f['train_id'] == train_id]
-        if not fit or any(f['certificate_status'] != 'Valid' or datetime.date.today() > datetime.datetime.strptime(f['valid_till'], '%Y-%m-%d').date() for f in fit):
+        fit = fitness_by_train.get(train_id, [])
+        if not fit or any(f['certificate_status'] != 'Valid' or today > datetime.datetime.strptime(f['valid_till'], '%Y-%m-%d').date() for f in fit):
             issues.append("Invalid/Expired Fitness")
 
         # Job check
-        open_jobs = [j for j in jobs if j['train_id'] == train_id and j['status'] != 'Closed']
+        open_jobs = [j for j in jobs_by_train.get(train_id, []) if j['status'] != 'Closed']
         if open_jobs:
             issues.append("Open Job Cards")
 
         # Cleaning check
-        pending_clean = [c for c in cleaning if c['train_id'] == train_id and c['status'] != 'Done']
+        pending_clean = [c for c in cleaning_by_train.get(train_id, []) if c['status'] != 'Done']
         if pending_clean:
             issues.append("Pending Cleaning")
 
@@ -45,31 +49,101 @@ def run_simulation(params):
             'issues': issues,
             'issue_count': len(issues)
         })
+    return train_statuses
+
+
+def annotate_branding(train_statuses, branding):
+    """Add branding priority and exposure hours to each status dict."""
+    brand_by_train = {}
+    for b in branding:
+        brand_by_train.setdefault(b['train_id'], b)
+    for ts in train_statuses:
+        brand = brand_by_train.get(ts['id'])
+        ts['priority'] = brand['priority_level'] if brand else 'Low'
+        ts['exposure'] = brand['exposure_hours'] if brand else 0
+
+
+def failure_risk_by_train(db_name=DB_NAME):
+    """Predicted failure risk (0-1) per train id."""
+    from failure_model import predict_failure_risk
+
+    return predict_failure_risk(db_name)
+
+
+def campaign_shortfall_by_train(branding, db_name=DB_NAME):
+    """Largest projected exposure shortfall (hours) among each train's active campaigns, per train id."""
+    from exposure_ledger import campaign_shortfalls
+
+    # Hours delivered outside a campaign's window do not count, so only active campaigns rank
+    shortfalls = {name: c['shortfall_hours'] for name, c in campaign_shortfalls(db_name=db_name).items()
+                  if c['active']}
+    by_train = {}
+    for b in branding:
+        shortfall = shortfalls.get(b['campaign_name'], 0.0)
+        by_train[b['train_id']] = max(by_train.get(b['train_id'], 0.0), shortfall)
+    return by_train
+
+
+def compute_signals(branding, params, db_name=DB_NAME):
+    """
+    Fleet-wide ranking signals the scenario asks for: {signal name: {train_id: value}}.
+    Computed once and applied to any subset of trains with apply_signals.
+    """
+    signals = {}
+    if params.get('prioritize_advertiser', False):
+        signals['campaign_shortfall'] = campaign_shortfall_by_train(branding, db_name)
+    if params.get('use_failure_risk', False):
+        signals['failure_risk'] = failure_risk_by_train(db_name)
+    return signals
+
+
+def apply_signals(train_statuses, signals):
+    """Add precomputed signals to each status dict (0.0 for trains without a value)."""
+    for name, by_train in signals.items():
+        for ts in train_statuses:
+            ts[name] = by_train.get(ts['id'], 0.0)
+
+
+def annotate_signals(train_statuses, branding, params, db_name=DB_NAME):
+    """Add the ranking signals the scenario asks for (campaign shortfall, failure risk)."""
+    apply_signals(train_statuses, compute_signals(branding, params, db_name))
 
+
+def candidate_sort_key(ts, params):
+    """
+    Ordering of induction candidates: trains carrying at-risk campaigns (largest projected
+    shortfall) and higher branding priority first, then lowest failure risk.
+    """
+    key = []
+    if params.get('prioritize_advertiser', False):
+        key.append(-ts.get('campaign_shortfall', 0.0))
+        key.append(-PRIORITY_ORDER.get(ts['priority'], 0))
+    if params.get('use_failure_risk', False):
+        key.append(ts.get('failure_risk', 0.0))
+    return tuple(key)
+
+
+def select_candidates(train_statuses, branding, params):
+    """Apply overrides and return induction candidates in priority order (not yet limited)."""
     # Apply overrides
     for ts in train_statuses:
         if params.get('allow_risky_trains', False) and ts['issue_count'] <= params.get('max_issues_allowed', 1):
             ts['status'] = "Passed Checks"  # Override to allow
 
-    # Select induction candidates
     # Prioritize passed checks, then by branding priority if advertiser focus
     candidates = [ts for ts in train_statuses if ts['status'] == "Passed Checks"]
     if params.get('prioritize_advertiser', False):
         # Add branding info
-        for ts in candidates:
-            brand = next((b for b in branding if b['train_id'] == ts['id']), None)
-            ts['priority'] = brand['priority_level'] if brand else 'Low'
-            ts['exposure'] = brand['exposure_hours'] if brand else 0
-        # Sort by priority (High > Medium > Low)
-        priority_order = {'High': 3, 'Medium': 2, 'Low': 1}
-        candidates.sort(key=lambda x: priority_order.get(x['priority'], 0), reverse=True)
+        annotate_branding(candidates, branding)
+    # Stable sort: trains keep fleet order within equal keys
+    candidates.sort(key=lambda ts: candidate_sort_key(ts, params))
+    return candidates
 
-    # Limit to min_induction_count
-    selected = candidates[:params.get('min_induction_count', len(candidates))]
 
-    # Compute metrics
+def compute_metrics(selected, total_trains, params):
+    """Punctuality, cost, safety and advertiser metrics for a selection."""
     total_selected = len(selected)
-    punctuality = (total_selected / len(trains)) * 100 if trains else 0  # % ready trains inducted
+    punctuality = (total_selected / total_trains) * 100 if total_trains else 0  # % ready trains inducted
 
     # Cost: base per train + penalty per issue overridden
     base_cost_per_train = 1000  # Assume fixed cost
@@ -83,12 +157,48 @@ def run_simulation(params):
     # Advertiser: total exposure hours
     advertiser_exposure = sum(ts.get('exposure', 0) for ts in selected)
 
+    return {
+        'punctuality': round(punctuality, 2),
+        'cost': cost,
+        'safety_score': round(safety_score, 2),
+        'advertiser_exposure': round(advertiser_exposure, 2)
+    }
+
+
+def fetch_fleet_data(db_name=DB_NAME):
+    """Rows of every table the simulation reads, keyed by table name."""
+    return {table: fetch_all(table, db_name=db_name) for table in ("trains", "fitness_certificates", "job_cards",
+                                                                   "cleaning_slots", "branding_priorities")}
+
+
+def run_simulation(params, data=None):
+    """
+    Run the what-if simulation for train induction.
+    params: dict with scenario variables
+    data: optional pre-fetched rows (see fetch_fleet_data)
+    Returns: dict with metrics, selected trains, all candidates in priority order and the
+    status of every train
+    """
+    # Fetch data
+    if data is None:
+        data = fetch_fleet_data()
+    trains = data['trains']
+    branding = data['branding_priorities']
+
+    # Compute base statuses
+    train_statuses = compute_train_statuses(trains, data['fitness_certificates'], data['job_cards'],
+                                            data['cleaning_slots'])
+    annotate_signals(train_statuses, branding, params)
+
+    # Select induction candidates
+    candidates = select_candidates(train_statuses, branding, params)
+
+    # Limit to min_induction_count
+    selected = candidates[:params.get('min_induction_count', len(candidates))]
+
     return {
         'selected_trains': selected,
-        'metrics': {
-            'punctuality': round(punctuality, 2),
-            'cost': cost,
-            'safety_score': round(safety_score, 2),
-            'advertiser_exposure': round(advertiser_exposure, 2)
-        }
+        'candidates': candidates,
+        'train_statuses': train_statuses,
+        'metrics': compute_metrics(selected, len(trains), params)
     }
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import queue
+import logging
+import datetime
+import threading
+from collections import deque
+from database_setup import DB_NAME, fetch_all, migrate
+from db_writer import get_writer
+from simulation import compute_train_statuses
+
+# Sensor severities that open / close an IoT job card
+FAULT_SEVERITIES = {"fault", "critical"}
+CLEAR_SEVERITIES = {"ok", "clear"}
+
+
+# Fields each event type must carry (train_id is always required)
+REQUIRED_FIELDS = {
+    "job_card": ("job_card_no",),
+    "certificate": ("certificate_status", "valid_till"),
+    "fitness": ("severity",),
+}
+
+MAX_REJECTED = 1000  # Rejected events kept in memory for inspection
+
+logger = logging.getLogger(__name__)
+
+
+def validate_event(event):
+    """
+    Check an event before it reaches the writer. Returns a copy with train_id as int and
+    valid_till as an ISO date; raises ValueError.
+    """
+    if not isinstance(event, dict):
+        raise ValueError("Event is not an object")
+    kind = event.get("type")
+    if kind not in REQUIRED_FIELDS:
+        raise ValueError(f"Unknown event type: {kind}")
+    missing = [f for f in ("train_id",) + REQUIRED_FIELDS[kind] if event.get(f) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing fields for {kind}: {', '.join(missing)}")
+    for field, value in event.items():
+        if not isinstance(value, (str, int, float, type(None))):
+            raise ValueError(f"Field {field} must be a scalar, got {type(value).__name__}")
+    try:
+        train_id = int(event["train_id"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid train_id: {event['train_id']!r}")
+    valid = {**event, "train_id": train_id}
+    if kind == "certificate":
+        # Readiness checks parse valid_till as YYYY-MM-DD; an unparseable date would break every plan
+        try:
+            valid["valid_till"] = datetime.date.fromisoformat(str(event["valid_till"])).isoformat()
+        except ValueError:
+            raise ValueError(f"Invalid valid_till (expected YYYY-MM-DD): {event['valid_till']!r}")
+    return valid
+
+
+def _iot_job_card_no(event):
+    return f"IOT-{event.get('sensor', 'GENERIC')}"
+
+
+def _event_key(event):
+    """
+    Events with the same key write the same row and overwrite each other within a batch
+    (last one wins). A fault/clear reading shares the key of the IoT job card it opens/closes.
+    """
+    kind = event["type"]
+    if kind == "job_card":
+        return ("job_card", event["train_id"], event["job_card_no"])
+    if kind == "certificate":
+        return (kind, event["train_id"], event.get("issued_by", ""))
+    if str(event.get("severity", "")).lower() in FAULT_SEVERITIES | CLEAR_SEVERITIES:
+        return ("job_card", event["train_id"], _iot_job_card_no(event))
+    return (kind, event["train_id"], event.get("sensor", ""))
+
+
+def _upsert_job_card(cur, train_id, job_card_no, status, source_system):
+    cur.execute("UPDATE job_cards SET status = ?, source_system = ? WHERE train_id = ? AND job_card_no = ?",
+                (status, source_system, train_id, job_card_no))
+    if cur.rowcount == 0:
+        cur.execute("INSERT INTO job_cards (train_id, job_card_no, status, source_system) VALUES (?, ?, ?, ?)",
+                    (train_id, job_card_no, status, source_system))
+
+
+def apply_event(cur, event):
+    """Write one validated job-card, certificate or sensor fitness event."""
+    kind = event["type"]
+    train_id = event["train_id"]
+    if kind == "job_card":
+        _upsert_job_card(cur, train_id, event["job_card_no"], event.get("status", "Open"),
+                         event.get("source_system", "Maximo"))
+    elif kind == "certificate":
+        issued_by = event.get("issued_by", "")
+        cur.execute("UPDATE fitness_certificates SET certificate_status = ?, valid_till = ? "
+                    "WHERE train_id = ? AND issued_by = ?",
+                    (event["certificate_status"], event["valid_till"], train_id, issued_by))
+        if cur.rowcount == 0:
+            cur.execute("INSERT INTO fitness_certificates (train_id, certificate_status, valid_till, issued_by) "
+                        "VALUES (?, ?, ?, ?)",
+                        (train_id, event["certificate_status"], event["valid_till"], issued_by))
+    elif kind == "fitness":
+        # Sensor-derived fitness: a fault opens an IoT job card, a clear reading closes it
+        severity = str(event.get("severity", "")).lower()
+        job_card_no = _iot_job_card_no(event)
+        if severity in FAULT_SEVERITIES:
+            _upsert_job_card(cur, train_id, job_card_no, "Open", "IoT")
+        elif severity in CLEAR_SEVERITIES:
+            _upsert_job_card(cur, train_id, job_card_no, "Closed", "IoT")
+
+
+def _apply_batch(cur, events):
+    """Apply each event in its own savepoint so one failing event does not undo the rest.
+    Returns the list of (event, error) pairs that failed."""
+    failed = []
+    for event in events:
+        cur.execute("SAVEPOINT event")
+        try:
+            apply_event(cur, event)
+        except Exception as e:
+            cur.execute("ROLLBACK TO event")
+            failed.append((event, str(e)))
+        cur.execute("RELEASE event")
+    return failed
+
+
+class StreamIngestor:
+    """
+    Micro-batching writer for event streams.
+    Producers call put(); a collector thread drains the bounded queue in batches of up to
+    batch_size events (or whatever arrived within max_wait seconds), validates them and hands
+    each batch to the shared single writer, so it lands in one group commit with each event in
+    its own savepoint. Events that fail validation or writing are counted in stats['rejected']
+    and kept (most recent MAX_REJECTED) in self.rejected with the reason. After each batch
+    on_batch is called with the ids of the trains it touched. A full queue blocks producers
+    (back-pressure).
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=1000, max_wait=0.05, queue_size=20000, on_batch=None):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.on_batch = on_batch or self.refresh_readiness
+        self.readiness = {}
+        self.rejected = deque(maxlen=MAX_REJECTED)
+        self.stats = {'events': 0, 'batches': 0, 'rejected': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        migrate(self.db_name)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stream-collector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Flush everything queued so far, then stop the collector."""
+        self._queue.join()
+        self._stop.set()
+        self._thread.join()
+
+    def put(self, event, timeout=None):
+        """Queue an event; blocks while the queue is full."""
+        self._queue.put(event, timeout=timeout)
+
+    def reject(self, event, reason):
+        """Record an event that could not be ingested."""
+        self.stats['rejected'] += 1
+        self.rejected.append((event, reason))
+        logger.warning("Rejected stream event %r: %s", event, reason)
+
+    def _collect_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                # Validate, then coalesce: only the latest event per key needs writing
+                latest = {}
+                accepted = 0
+                for event in batch:
+                    try:
+                        valid = validate_event(event)
+                    except ValueError as e:
+                        self.reject(event, str(e))
+                        continue
+                    # Re-insert so the batch keeps each key at the position of its last event
+                    key = _event_key(valid)
+                    latest.pop(key, None)
+                    latest[key] = valid
+                    accepted += 1
+                events = list(latest.values())
+
+                try:
+                    failed = get_writer(self.db_name).submit_call(lambda cur: _apply_batch(cur, events)).result()
+                except Exception as e:
+                    failed = [(event, f"Batch write failed: {e}") for event in events]
+                for event, reason in failed:
+                    self.reject(event, reason)
+
+                failed_ids = {id(event) for event, _ in failed}
+                written = [e for e in events if id(e) not in failed_ids]
+                self.stats['events'] += accepted - len(failed)
+                self.stats['batches'] += 1
+                if written:
+                    self.on_batch({e["train_id"] for e in written})
+            except Exception:
+                logger.exception("Stream batch processing failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def refresh_readiness(self, train_ids):
+        """
+        Default on_batch hook: recompute readiness for the given trains into self.readiness.
+        The app does not read self.readiness; it is there for callers embedding the ingestor
+        (pass on_batch to react to batches differently).
+        """
+        placeholders = ", ".join("?" * len(train_ids))
+        args = tuple(train_ids)
+        where = f"train_id IN ({placeholders})"
+        statuses = compute_train_statuses(
+            fetch_all("trains", f"id IN ({placeholders})", args, self.db_name),
+            fetch_all("fitness_certificates", where, args, self.db_name),
+            fetch_all("job_cards", where, args, self.db_name),
+            fetch_all("cleaning_slots", where, args, self.db_name)
+        )
+        for ts in statuses:
+            self.readiness[ts['id']] = ts
+
+
+def _ingest_file(file_path, ingestor):
+    """Queue every event in one .jsonl file; lines that are not UTF-8 JSON go to <name>.rejected."""
+    base = file_path[:-len(".jsonl")]
+    bad_lines = []
+    with open(file_path, "rb") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)  # UnicodeDecodeError is a ValueError too
+            except ValueError as e:
+                bad_lines.append(line)
+                ingestor.reject(line.decode(errors="replace"),
+                                f"{os.path.basename(file_path)}:{line_no}: invalid JSON ({e})")
+                continue
+            ingestor.put(event)
+    if bad_lines:
+        with open(base + ".rejected", "ab") as f:
+            f.write(b"\n".join(bad_lines) + b"\n")
+    os.replace(file_path, base + ".done")
+
+
+def watch_directory(path, ingestor, poll_interval=0.5, stop_event=None):
+    """
+    Local stand-in for Maximo/IoT feeds: consume *.jsonl files in path (one JSON event per
+    line) and rename each to *.done once queued. Lines that are not valid JSON are rejected
+    and copied to *.rejected instead of stopping the watcher; a file that cannot be read at
+    all is moved aside to *.jsonl.rejected.
+    Producers must write each file under another name (e.g. *.jsonl.tmp) and rename it to
+    *.jsonl when complete, so the watcher never reads a half-written file.
+    """
+    os.makedirs(path, exist_ok=True)
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(".jsonl"):
+                continue
+            file_path = os.path.join(path, name)
+            try:
+                _ingest_file(file_path, ingestor)
+            except Exception:
+                logger.exception("Could not ingest %s; moving it aside", name)
+                try:
+                    os.replace(file_path, file_path + ".rejected")
+                except OSError:
+                    logger.exception("Could not move %s aside", name)
+        stop_event.wait(poll_interval)
+
+
+if __name__ == "__main__":
+    ingestor = StreamIngestor().start()
+    print("📡 Watching ./inbox for *.jsonl event files (Ctrl+C to stop)")
+    try:
+        watch_directory("inbox", ingestor)
+    except KeyboardInterrupt:
+        ingestor.stop()